@@ -33,10 +33,10 @@ crc8table = bytearray([
     0xb6, 0xe8, 0x0a, 0x54, 0xd7, 0x89, 0x6b, 0x35])
 
 
-def crc8(buf):
+def crc8(buf, table=crc8table):
     crc = 0x77
     for v in buf:
-        crc = crc8table[(crc ^ v) & 0xff]
+        crc = table[crc ^ v]
     return crc
 
 crc16table = [
@@ -74,8 +74,8 @@ crc16table = [
     0x7bc7, 0x6a4e, 0x58d5, 0x495c, 0x3de3, 0x2c6a, 0x1ef1, 0x0f78]
 
 
-def crc16(buf):
+def crc16(buf, table=tuple(crc16table)):
     crc = 0x3692
     for v in buf:
-        crc = crc16table[(crc ^ int(v)) & 0xff] ^ (crc >> 8)
+        crc = table[(crc ^ v) & 0xff] ^ (crc >> 8)
     return crc
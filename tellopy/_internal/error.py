@@ -1,10 +1,12 @@
 """Error types for tellopy"""
+from . utils import byte_to_hexstring
 
 
 class TelloError(Exception):
     """Base class for all Tello errors"""
 
     def __init__(self, msg):
+        super(TelloError, self).__init__(msg)
         self.msg = msg
 
     def __str__(self):
@@ -12,3 +14,23 @@ class TelloError(Exception):
 
     def __repr__(self):
         return self.__str__()
+
+
+class LogCorrupt(TelloError):
+    """Log data packet framing is broken at pos.
+
+    data is the caller's packet, referenced rather than copied; the tail from pos
+    is sliced and hex encoded only when the error is printed.
+    """
+
+    def __init__(self, pos, data=b''):
+        super(LogCorrupt, self).__init__('LogData: corrupted data at pos=%d' % pos)
+        self.pos = pos
+        self.data = data
+
+    def __reduce__(self):
+        return (self.__class__, (self.pos, bytes(bytearray(self.data))))
+
+    def __str__(self):
+        return '%s, data=%s' % (super(LogCorrupt, self).__str__(),
+                                byte_to_hexstring(bytearray(self.data[self.pos:])))
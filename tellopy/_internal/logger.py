@@ -23,29 +23,40 @@ class Logger(object):
     def set_level(self, level):
         self.log_level = level
 
+    def is_enabled_for(self, level):
+        return level <= self.log_level
+
     def output(self, msg):
         self.lock.acquire()
         print(msg)
         self.lock.release()
 
-    def error(self, str):
+    def error(self, str, *args):
         if self.log_level < LOG_ERROR:
             return
+        if args:
+            str = str % args
         self.output("%s: Error: %s" % (self.header(), str))
 
-    def warn(self, str):
+    def warn(self, str, *args):
         if self.log_level < LOG_WARN:
             return
+        if args:
+            str = str % args
         self.output("%s:  Warn: %s" % (self.header(), str))
 
-    def info(self, str):
+    def info(self, str, *args):
         if self.log_level < LOG_INFO:
             return
+        if args:
+            str = str % args
         self.output("%s:  Info: %s" % (self.header(), str))
 
-    def debug(self, str):
+    def debug(self, str, *args):
         if self.log_level < LOG_DEBUG:
             return
+        if args:
+            str = str % args
         self.output("%s: Debug: %s" % (self.header(), str))
 
 
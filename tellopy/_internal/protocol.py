@@ -1,7 +1,15 @@
 import datetime
 import struct
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from . import crc
+from . import error
+from . import logger
 from . utils import *
 
 START_OF_PACKET = 0xcc
@@ -42,16 +50,57 @@ VIDRATE_2000Kbps = 3
 VIDRATE_2500Kbps = 4
 VIDRATE_MAX_INT = 5
 
+_U16LE = struct.Struct('<H')
+_TIME_STRUCT = struct.Struct('<HHHHH')
+
+
+def _time_fields(time=None):
+    """Return the TIME_CMD fields: hour, minute, second and the millisecond low and high byte."""
+    if time is None:
+        time = datetime.datetime.now()
+    millisec = time.microsecond // 1000
+    return (time.hour, time.minute, time.second, millisec & 0xff, (millisec >> 8) & 0xff)
+
+
+# Python 2 has no time.monotonic()
+_monotonic = getattr(time, 'monotonic', time.time)
+
+# [date, monotonic time it was read], refreshed at most once per second
+_today = [None, 0.0]
+
+
+def _get_today():
+    """Return today's date, possibly up to one second stale.
+
+    Just after midnight this can still return the previous day's date.
+    """
+    now = _monotonic()
+    if _today[0] is None or now - _today[1] > 1.0:
+        _today[0] = datetime.date.today()
+        _today[1] = now
+    return _today[0]
+
+
+_prefix_cache = {}
+
+
+def _compute_prefix(length):
+    """Return the 4-byte packet prefix (SOP, size << 3, CRC8) for a packet length."""
+    prefix = _prefix_cache.get(length)
+    if prefix is None:
+        size = length << 3
+        prefix = bytearray([START_OF_PACKET, size & 0xff, (size >> 8) & 0xff])
+        prefix.append(crc.crc8(prefix))
+        prefix = _prefix_cache[length] = bytes(prefix)
+    return prefix
+
 
 class Packet(object):
     def __init__(self, cmd, pkt_type=0x68):
-        if isinstance(cmd, str):
-            self.buf = bytearray()
-            for c in cmd:
-                self.buf.append(ord(c))
-        elif isinstance(cmd, (bytearray, bytes)):
-            self.buf = bytearray()
-            self.buf[:] = cmd
+        if isinstance(cmd, (bytearray, bytes)):
+            self.buf = bytearray(cmd)
+        elif isinstance(cmd, str):
+            self.buf = bytearray(cmd.encode('latin1'))
         else:
             self.buf = bytearray([
                 START_OF_PACKET,
@@ -62,13 +111,11 @@ class Packet(object):
                 0, 0])
 
     def fixup(self, seq_num=0):
-        buf = self.get_buffer()
+        buf = self.buf
         if buf[0] == START_OF_PACKET:
-            buf[1], buf[2] = le16(len(buf)+2)
-            buf[1] = (buf[1] << 3)
-            buf[3] = crc.crc8(buf[0:3])
-            buf[7], buf[8] = le16(seq_num)
-            self.add_int16(crc.crc16(buf))
+            buf[0:4] = _compute_prefix(len(buf)+2)
+            _U16LE.pack_into(buf, 7, seq_num & 0xffff)
+            buf += _U16LE.pack(crc.crc16(buf))
 
     def get_buffer(self):
         return self.buf
@@ -80,15 +127,10 @@ class Packet(object):
         self.buf.append(val & 0xff)
 
     def add_int16(self, val):
-        self.add_byte(val)
-        self.add_byte(val >> 8)
+        self.buf += _U16LE.pack(val & 0xffff)
 
-    def add_time(self, time=datetime.datetime.now()):
-        self.add_int16(time.hour)
-        self.add_int16(time.minute)
-        self.add_int16(time.second)
-        self.add_int16(int(time.microsecond/1000) & 0xff)
-        self.add_int16((int(time.microsecond/1000) >> 8) & 0xff)
+    def add_time(self, time=None):
+        self.buf += _TIME_STRUCT.pack(*_time_fields(time))
 
     def get_time(self, buf=None):
         if buf is None:
@@ -97,11 +139,74 @@ class Packet(object):
         min = int16(buf[2], buf[3])
         sec = int16(buf[4], buf[5])
         millisec = int16(buf[6], buf[8])
-        now = datetime.datetime.now()
-        return datetime.datetime(now.year, now.month, now.day, hour, min, sec, millisec)
+        today = _get_today()
+        return datetime.datetime(today.year, today.month, today.day, hour, min, sec, millisec)
+
+
+# 48-bit packed stick axes, followed in the payload by the add_time() fields
+_STICK_AXES_STRUCT = struct.Struct('<IH')
+
+
+def _stick_template():
+    pkt = Packet(STICK_CMD, 0x60)
+    pkt.buf += bytearray(_STICK_AXES_STRUCT.size + _TIME_STRUCT.size)
+    pkt.buf[0:4] = _compute_prefix(len(pkt.buf)+2)
+    return bytes(pkt.buf)
+
+
+_STICK_TEMPLATE = _stick_template()
+
+
+def build_stick_packet(packed_axes, seq_num=0, time=None):
+    """Return a fixed-up STICK_CMD Packet, patching only the varying fields of a template."""
+    pkt = Packet(_STICK_TEMPLATE)
+    buf = pkt.buf
+    _U16LE.pack_into(buf, 7, seq_num & 0xffff)
+    _STICK_AXES_STRUCT.pack_into(buf, 9, packed_axes & 0xffffffff, (packed_axes >> 32) & 0xffff)
+    _TIME_STRUCT.pack_into(buf, 9 + _STICK_AXES_STRUCT.size, *_time_fields(time))
+    buf += _U16LE.pack(crc.crc16(buf))
+    return pkt
+
+
+_FLIGHT_DATA_STRUCT = struct.Struct('<hhhhhBBBhhBBBBBBB')
+
+# flag tuples for every value of the packed state bytes 10, 17 and 22
+_BITS10 = [tuple((b >> k) & 0x1 for k in (0, 1, 2, 3, 4, 5, 7)) for b in range(256)]
+_BITS17 = [tuple((b >> k) & 0x1 for k in range(8)) for b in range(256)]
+_BITS22 = [tuple((b >> k) & 0x1 for k in range(3)) for b in range(256)]
+
+if np is not None:
+    # same on-wire layout as _FLIGHT_DATA_STRUCT, one record per 24-byte frame
+    FLIGHT_DATA_DTYPE = np.dtype([
+        ('height', '<i2'),
+        ('north_speed', '<i2'),
+        ('east_speed', '<i2'),
+        ('vertical_speed', '<i2'),
+        ('fly_time', '<i2'),
+        ('bits10', 'u1'),
+        ('imu_calibration_state', 'u1'),
+        ('battery_percentage', 'u1'),
+        ('drone_fly_time_left', '<i2'),
+        ('drone_battery_left', '<i2'),
+        ('bits17', 'u1'),
+        ('fly_mode', 'u1'),
+        ('throw_fly_timer', 'u1'),
+        ('camera_state', 'u1'),
+        ('electrical_machinery_state', 'u1'),
+        ('bits22', 'u1'),
+        ('bits23', 'u1')])
+else:
+    FLIGHT_DATA_DTYPE = None
 
 
 class FlightData(object):
+    """Decoded FLIGHT_MSG payload.
+
+    Callers keeping a history of flight data can use FlightData.parse_batch()
+    instead, which decodes many frames into one NumPy structured array whose
+    columns can be fed directly to plotting or analysis code.
+    """
+
     def __init__(self, data):
         self.battery_low = 0
         self.battery_lower = 0
@@ -144,44 +249,69 @@ class FlightData(object):
         if len(data) < 24:
             return
 
-        self.height = int16(data[0], data[1])
-        self.north_speed = int16(data[2], data[3])
-        self.east_speed = int16(data[4], data[5])
-        self.vertical_speed = int16(data[6], data[7])
-        self.fly_time = int16(data[8], data[9])
-
-        self.imu_state = ((data[10] >> 0) & 0x1)
-        self.pressure_state = ((data[10] >> 1) & 0x1)
-        self.down_visual_state = ((data[10] >> 2) & 0x1)
-        self.power_state = ((data[10] >> 3) & 0x1)
-        self.battery_state = ((data[10] >> 4) & 0x1)
-        self.gravity_state = ((data[10] >> 5) & 0x1)
-        self.wind_state = ((data[10] >> 7) & 0x1)
-
-        self.imu_calibration_state = data[11]
-        self.battery_percentage = data[12]
-        self.drone_fly_time_left = int16(data[13], data[14])
-        self.drone_battery_left = int16(data[15], data[16])
-
-        self.em_sky = ((data[17] >> 0) & 0x1)
-        self.em_ground = ((data[17] >> 1) & 0x1)
-        self.em_open = ((data[17] >> 2) & 0x1)
-        self.drone_hover = ((data[17] >> 3) & 0x1)
-        self.outage_recording = ((data[17] >> 4) & 0x1)
-        self.battery_low = ((data[17] >> 5) & 0x1)
-        self.battery_lower = ((data[17] >> 6) & 0x1)
-        self.factory_mode = ((data[17] >> 7) & 0x1)
-
-        self.fly_mode = data[18]
-        self.throw_fly_timer = data[19]
-        self.camera_state = data[20]
-        self.electrical_machinery_state = data[21]
-
-        self.front_in = ((data[22] >> 0) & 0x1)
-        self.front_out = ((data[22] >> 1) & 0x1)
-        self.front_lsc = ((data[22] >> 2) & 0x1)
-
-        self.temperature_height = ((data[23] >> 0) & 0x1)
+        (self.height,
+         self.north_speed,
+         self.east_speed,
+         self.vertical_speed,
+         self.fly_time,
+         bits10,
+         self.imu_calibration_state,
+         self.battery_percentage,
+         self.drone_fly_time_left,
+         self.drone_battery_left,
+         bits17,
+         self.fly_mode,
+         self.throw_fly_timer,
+         self.camera_state,
+         self.electrical_machinery_state,
+         bits22,
+         bits23) = _FLIGHT_DATA_STRUCT.unpack_from(data, 0)
+
+        (self.imu_state,
+         self.pressure_state,
+         self.down_visual_state,
+         self.power_state,
+         self.battery_state,
+         self.gravity_state,
+         self.wind_state) = _BITS10[bits10]
+
+        (self.em_sky,
+         self.em_ground,
+         self.em_open,
+         self.drone_hover,
+         self.outage_recording,
+         self.battery_low,
+         self.battery_lower,
+         self.factory_mode) = _BITS17[bits17]
+
+        (self.front_in,
+         self.front_out,
+         self.front_lsc) = _BITS22[bits22]
+
+        self.temperature_height = ((bits23 >> 0) & 0x1)
+
+    @staticmethod
+    def parse_batch(raw_frames, frame_size=_FLIGHT_DATA_STRUCT.size + 2):
+        """Decode concatenated FLIGHT_MSG payloads into an array of FLIGHT_DATA_DTYPE.
+
+        Each frame is what Tello passes to FlightData: the bytes of a received
+        FLIGHT_MSG packet after its 9-byte header, i.e. packet[9:], which ends
+        with the packet's 2-byte CRC16 (26 bytes in total). Tello itself only
+        publishes decoded FlightData objects, so callers collect these from
+        recorded packets. Pass frame_size=24 for payloads already stripped of
+        the CRC. Bytes past the first 24 of each frame are skipped.
+
+        The state flags are left packed in the bits10, bits17, bits22 and bits23 fields.
+        """
+        if np is None:
+            raise ImportError('FlightData.parse_batch requires numpy')
+        names = FLIGHT_DATA_DTYPE.names
+        dtype = np.dtype({
+            'names': names,
+            'formats': [FLIGHT_DATA_DTYPE.fields[name][0] for name in names],
+            'offsets': [FLIGHT_DATA_DTYPE.fields[name][1] for name in names],
+            'itemsize': frame_size})
+        return np.frombuffer(raw_frames, dtype=dtype)
 
     def __str__(self):
         return (
@@ -190,7 +320,23 @@ class FlightData(object):
             (", battery_percentage=%2d" % self.battery_percentage) +
             (", drone_battery_left=0x%04x" % self.drone_battery_left) +
             "")
-            
+
+
+# length, checksum and id following the 0x55 sync byte of a log record
+_LOG_RECORD_HEADER_STRUCT = struct.Struct('<hBH')
+
+
+def _xor_bytes(buf, xorval):
+    """XOR every byte of buf with xorval, eight bytes per step as uint64 lanes."""
+    words = len(buf) >> 3
+    tail = words << 3
+    mask = xorval * 0x0101010101010101
+    fmt = '<%dQ' % words
+    out = bytearray(struct.pack(fmt, *[w ^ mask for w in struct.unpack_from(fmt, buf)]))
+    out += bytearray([x ^ xorval for x in buf[tail:]])
+    return out
+
+
 class LogData(object):
     ID_NEW_MVO_FEEDBACK                = 29
     ID_IMU_ATTI                        = 2048
@@ -222,27 +368,32 @@ class LogData(object):
             "")
 
     def update(self, data):
-        if isinstance(data, bytearray):
-            data = str(data)
-
-        self.log.debug('LogData: data length=%d' % len(data))
+        self.log.debug('LogData: data length=%d', len(data))
         self.count += 1
+        pos = self._update_records(byte_view(data))
+        # raised from here so the exception holds no view of the caller's buffer
+        if pos != len(data) - 2:
+            raise error.LogCorrupt(pos, data)
+
+    def _update_records(self, data):
+        """Decode and dispatch the records in data; return the position where framing stopped."""
+        end = len(data) - 2
         pos = 0
-        while (pos < len(data) - 2):
-            if (struct.unpack_from('B', data, pos+0)[0] != 0x55):
-                raise Exception('LogData: corrupted data at pos=%d, data=%s'
-                               % (pos, byte_to_hexstring(data[pos:])))
-            length = struct.unpack_from('<h', data, pos+1)[0]
-            checksum = data[pos+3]
-            id = struct.unpack_from('<H', data, pos+4)[0]
+        while pos < end:
+            if data[pos] != 0x55:
+                break
+            (length, checksum, id) = _LOG_RECORD_HEADER_STRUCT.unpack_from(data, pos+1)
             # 4bytes data[6:9] is tick
             # last 2 bytes are CRC
             # length-12 is the byte length of payload
+            if length < 12 or pos + length > end:
+                break
             xorval = data[pos+6]
-            if isinstance(data, str):
-                payload = bytearray([ord(x) ^ ord(xorval) for x in data[pos+10:pos+10+length-12]])
+            if np is not None:
+                payload = np.frombuffer(data, dtype=np.uint8, count=length-12,
+                                        offset=pos+10) ^ np.uint8(xorval)
             else:
-                payload = bytearray([x ^ xorval for x in data[pos+10:pos+10+length-12]])
+                payload = _xor_bytes(data[pos+10:pos+length-2], xorval)
             if id == self.ID_NEW_MVO_FEEDBACK:
                 self.mvo.update(payload, self.count)
             elif id == self.ID_IMU_ATTI:
@@ -253,9 +404,11 @@ class LogData(object):
                     self.unknowns.append(id)
 
             pos += length
-        if pos != len(data) - 2:
-            raise Exception('LogData: corrupted data at pos=%d, data=%s'
-                            % (pos, byte_to_hexstring(data[pos:])))
+        return pos
+
+
+# vel xyz at offset 2, pos xyz at offset 8
+_MVO_STRUCT = struct.Struct('<2x3h3f')
 
 
 class LogNewMvoFeedback(object):
@@ -290,14 +443,17 @@ class LogNewMvoFeedback(object):
             "")
 
     def update(self, data, count = 0):
-        self.log.debug('LogNewMvoFeedback: length=%d %s' % (len(data), byte_to_hexstring(data)))
+        if self.log.is_enabled_for(logger.LOG_DEBUG):
+            self.log.debug('LogNewMvoFeedback: length=%d %s', len(data), byte_to_hexstring(data))
         self.count = count
-        (self.vel_x, self.vel_y, self.vel_z) = struct.unpack_from('<hhh', data, 2)
-        self.vel_x /= 100.0
-        self.vel_y /= 100.0
-        self.vel_z /= 100.0
-        (self.pos_x, self.pos_y, self.pos_z) = struct.unpack_from('fff', data, 8)
-        self.log.debug('LogNewMvoFeedback: ' + str(self))
+        (vel_x, vel_y, vel_z,
+         self.pos_x, self.pos_y, self.pos_z) = _MVO_STRUCT.unpack_from(data, 0)
+        (self.vel_x, self.vel_y, self.vel_z) = (vel_x / 100.0, vel_y / 100.0, vel_z / 100.0)
+        self.log.debug('LogNewMvoFeedback: %s', self)
+
+
+# acc xyz at offset 20, gyro xyz at 32, quaternion at 48, vg xyz at 76
+_IMU_ATTI_STRUCT = struct.Struct('<20x3f3f4x4f12x3f')
 
 
 class LogImuAtti(object):
@@ -345,10 +501,11 @@ class LogImuAtti(object):
             "")
 
     def update(self, data, count = 0):
-        self.log.debug('LogImuAtti: length=%d %s' % (len(data), byte_to_hexstring(data)))
+        if self.log.is_enabled_for(logger.LOG_DEBUG):
+            self.log.debug('LogImuAtti: length=%d %s', len(data), byte_to_hexstring(data))
         self.count = count
-        (self.acc_x, self.acc_y, self.acc_z) = struct.unpack_from('fff', data, 20)
-        (self.gyro_x, self.gyro_y, self.gyro_z) = struct.unpack_from('fff', data, 32)
-        (self.q0, self.q1, self.q2, self.q3) = struct.unpack_from('ffff', data, 48)
-        (self.vg_x, self.vg_y, self.vg_z) = struct.unpack_from('fff', data, 76)
-        self.log.debug('LogImuAtti: ' + str(self))
+        (self.acc_x, self.acc_y, self.acc_z,
+         self.gyro_x, self.gyro_y, self.gyro_z,
+         self.q0, self.q1, self.q2, self.q3,
+         self.vg_x, self.vg_y, self.vg_z) = _IMU_ATTI_STRUCT.unpack_from(data, 0)
+        self.log.debug('LogImuAtti: %s', self)
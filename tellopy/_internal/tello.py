@@ -376,8 +376,6 @@ class Tello(object):
         self.fast_mode = False
 
     def __send_stick_command(self):
-        pkt = Packet(STICK_CMD, 0x60)
-
         axis1 = int(1024 + 660.0 * self.right_x) & 0x7ff
         axis2 = int(1024 + 660.0 * self.right_y) & 0x7ff
         axis3 = int(1024 + 660.0 * self.left_y) & 0x7ff
@@ -400,15 +398,7 @@ class Tello(object):
         '''
         packed = axis1 | (axis2 << 11) | (
             axis3 << 22) | (axis4 << 33) | (axis5 << 44)
-        packed_bytes = struct.pack('<Q', packed)
-        pkt.add_byte(byte(packed_bytes[0]))
-        pkt.add_byte(byte(packed_bytes[1]))
-        pkt.add_byte(byte(packed_bytes[2]))
-        pkt.add_byte(byte(packed_bytes[3]))
-        pkt.add_byte(byte(packed_bytes[4]))
-        pkt.add_byte(byte(packed_bytes[5]))
-        pkt.add_time()
-        pkt.fixup()
+        pkt = build_stick_packet(packed)
         self.log.debug("stick command: %s" %
                        byte_to_hexstring(pkt.get_buffer()))
         return self.send_packet(pkt)
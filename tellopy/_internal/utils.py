@@ -8,6 +8,14 @@ def byte(c):
     return c
 
 
+if sys.version_info[0] < 3:
+    # Python 2 memoryviews index as 1-char str, so fall back to one bytearray copy
+    byte_view = bytearray
+else:
+    # slices of a memoryview are windows onto the packet, not copies
+    byte_view = memoryview
+
+
 def le16(val):
     return (val & 0xff), ((val >> 8) & 0xff)
 